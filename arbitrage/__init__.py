@@ -1,5 +1,11 @@
+from dotenv import load_dotenv
+
+# Load .env before any submodule runs: loggers read LOG_LEVEL when they are
+# created at import time, and Settings() reads its defaults from the environment
+load_dotenv()
+
 __all__ = [
     "config",
 ]
 
-__version__ = "0.1.0"
\ No newline at end of file
+__version__ = "0.1.0"
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def vwap(levels: np.ndarray, amount_base: float) -> Tuple[float, float]:
+    """
+    Walk an (N, 2) [price, amount] book side until amount_base is filled.
+    Returns (avg_price, filled); filled == 0.0 means nothing could be filled.
+    """
+    remaining = amount_base
+    total_quote = 0.0
+    filled = 0.0
+    for i in range(levels.shape[0]):
+        price = levels[i, 0]
+        amount = levels[i, 1]
+        if amount <= 0.0 or price <= 0.0:
+            continue
+        take = remaining if remaining < amount else amount
+        total_quote += take * price
+        remaining -= take
+        filled += take
+        if remaining <= 1e-12:
+            break
+    if filled <= 0.0:
+        return 0.0, 0.0
+    return total_quote / filled, filled
+
+
+@njit(cache=True)
+def fused_profit(
+    asks: np.ndarray,
+    bids: np.ndarray,
+    amount_base: float,
+    fee_buy: float,
+    fee_sell: float,
+    withdraw_fee_base: float,
+) -> Tuple[float, float, float, float]:
+    """
+    Buy amount_base against asks, sell it against bids and apply fees, as
+    compute_vwap_for_amount + estimate_fee_aware_profit_pct do.
+    Returns (profit_pct, base_amount, buy_avg, sell_avg); base_amount == 0.0
+    means either side could not be filled.
+    """
+    buy_avg, buy_filled = vwap(asks, amount_base)
+    sell_avg, sell_filled = vwap(bids, amount_base)
+    if buy_filled <= 0.0 or sell_filled <= 0.0:
+        return -100.0, 0.0, 0.0, 0.0
+    base_amount = buy_filled if buy_filled < sell_filled else sell_filled
+
+    cost_quote_with_fee = base_amount * buy_avg * (1.0 + fee_buy)
+    base_after_withdraw = base_amount - withdraw_fee_base
+    if base_after_withdraw < 0.0:
+        base_after_withdraw = 0.0
+    revenue_quote_after_fee = base_after_withdraw * sell_avg * (1.0 - fee_sell)
+    if cost_quote_with_fee <= 0.0:
+        return -100.0, base_amount, buy_avg, sell_avg
+    profit_pct = (revenue_quote_after_fee - cost_quote_with_fee) / cost_quote_with_fee * 100.0
+    return profit_pct, base_amount, buy_avg, sell_avg
+
+
+@njit(cache=True)
+def _sized_profit(
+    asks: np.ndarray,
+    bids: np.ndarray,
+    target_quote: float,
+    min_base: float,
+    fee_buy: float,
+    fee_sell: float,
+    withdraw_fee_base: float,
+) -> Tuple[float, float, float, float]:
+    # fused_profit for the base amount worth target_quote at the top ask
+    if asks.shape[0] == 0 or bids.shape[0] == 0 or asks[0, 0] <= 0.0:
+        return -100.0, 0.0, 0.0, 0.0
+    amount_base = target_quote / asks[0, 0]
+    if amount_base < min_base:
+        amount_base = min_base
+    return fused_profit(asks, bids, amount_base, fee_buy, fee_sell, withdraw_fee_base)
+
+
+@njit(cache=True)
+def eval_pair(
+    asks_a: np.ndarray,
+    bids_a: np.ndarray,
+    asks_b: np.ndarray,
+    bids_b: np.ndarray,
+    target_quote: float,
+    min_base: float,
+    taker_a: float,
+    taker_b: float,
+    withdraw_fee_base: float,
+) -> Tuple[float, float, float, float, float, float, float, float]:
+    """
+    Both directions of one symbol in a single call: buy on A/sell on B, then
+    buy on B/sell on A, each sized by target_quote at its buy side's top ask.
+    Returns the two fused_profit results concatenated; a base_amount of 0.0
+    means that direction could not be filled.
+    """
+    p_ab, base_ab, buy_ab, sell_ab = _sized_profit(
+        asks_a, bids_b, target_quote, min_base, taker_a, taker_b, withdraw_fee_base
+    )
+    p_ba, base_ba, buy_ba, sell_ba = _sized_profit(
+        asks_b, bids_a, target_quote, min_base, taker_b, taker_a, withdraw_fee_base
+    )
+    return p_ab, base_ab, buy_ab, sell_ab, p_ba, base_ba, buy_ba, sell_ba
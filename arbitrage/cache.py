@@ -1,10 +1,33 @@
-import json
+import mmap
 import os
 import sqlite3
+import threading
 import time
-from typing import Any, Optional
+import weakref
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 
-from .utils import ensure_dir
+import msgpack
+import zstandard
+
+from .markets import Markets
+from .utils import ensure_dir, json_loads
+
+# Payload encodings, recorded per row in kv_store.schema_version. New rows are
+# always msgpack + zstd; JSON rows are those written by older versions.
+SCHEMA_JSON = 0
+SCHEMA_MSGPACK_ZSTD = 1
+
+
+def _encode(value: Any) -> Tuple[bytes, int]:
+    packed = msgpack.packb(value, use_bin_type=True)
+    return zstandard.ZstdCompressor(level=3).compress(packed), SCHEMA_MSGPACK_ZSTD
+
+
+def _decode(payload: Any, schema_version: int) -> Optional[Any]:
+    if schema_version == SCHEMA_MSGPACK_ZSTD:
+        return msgpack.unpackb(zstandard.ZstdDecompressor().decompress(payload), raw=False)
+    # Legacy JSON: both BLOB payloads and TEXT rows
+    return json_loads(payload)
 
 
 class SqliteKVCache:
@@ -13,61 +36,256 @@ class SqliteKVCache:
         parent = os.path.dirname(db_path)
         if parent:
             ensure_dir(parent)
+        # One connection for the lifetime of the cache; autocommit mode, with
+        # access serialized by the lock so it can be shared across threads.
+        self._conn: Optional[sqlite3.Connection] = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self._lock = threading.Lock()
+        # Closes the connection at interpreter exit (or when the cache is
+        # garbage collected) without the exit hook keeping the cache alive
+        self._finalizer = weakref.finalize(self, self._conn.close)
         self._init_db()
 
+    def _connection(self) -> sqlite3.Connection:
+        # Callers hold self._lock
+        if self._conn is None:
+            raise sqlite3.ProgrammingError(f"Cache {self.db_path} is closed")
+        return self._conn
+
     def _init_db(self) -> None:
-        conn = sqlite3.connect(self.db_path)
-        try:
+        with self._lock:
+            conn = self._connection()
+            # WAL is persisted in the database file; the remaining pragmas are
+            # per-connection tuning for commit latency and page cache size.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-64000")
+            conn.execute("PRAGMA mmap_size=268435456")
+            # Checkpoint less often from COMMIT; bulk writers call checkpoint() instead
+            conn.execute("PRAGMA wal_autocheckpoint=10000")
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS kv_store (
                     k TEXT PRIMARY KEY,
-                    v TEXT NOT NULL,
-                    updated_at INTEGER NOT NULL
+                    v BLOB NOT NULL,
+                    updated_at INTEGER NOT NULL,
+                    schema_version INTEGER NOT NULL DEFAULT 0
                 )
                 """
             )
-            conn.commit()
-        finally:
-            conn.close()
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(kv_store)")}
+            if "schema_version" not in columns:
+                # Databases created before payload encodings were tracked hold JSON text
+                conn.execute(
+                    "ALTER TABLE kv_store ADD COLUMN schema_version INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def checkpoint(self) -> None:
+        # Copy WAL frames back into the database without blocking readers/writers
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._finalizer()  # closes the connection, at most once
+                self._conn = None
 
     def set_json(self, key: str, value: Any) -> None:
-        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        payload, schema_version = _encode(value)
         now = int(time.time())
-        conn = sqlite3.connect(self.db_path)
-        try:
-            conn.execute(
-                "INSERT OR REPLACE INTO kv_store(k, v, updated_at) VALUES(?, ?, ?)",
-                (key, payload, now),
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO kv_store(k, v, updated_at, schema_version) VALUES(?, ?, ?, ?)",
+                (key, payload, now, schema_version),
             )
-            conn.commit()
-        finally:
-            conn.close()
+
+    def set_json_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        now = int(time.time())
+        rows = [(key, *_encode(value), now) for key, value in items]
+        if not rows:
+            return
+        # Single transaction so N keys cost one commit instead of N
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO kv_store(k, v, schema_version, updated_at) VALUES(?, ?, ?, ?)",
+                    rows,
+                )
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def get_json(self, key: str, ttl_seconds: Optional[int] = None) -> Optional[Any]:
+        entry = self.get_entry(key, ttl_seconds=ttl_seconds)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str, ttl_seconds: Optional[int] = None) -> Optional[Tuple[Any, int]]:
+        # Like get_json, but also returns the row's updated_at timestamp
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT v, updated_at, schema_version FROM kv_store WHERE k = ? LIMIT 1", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        v, updated_at, schema_version = row
+        if ttl_seconds is not None:
+            if int(time.time()) - int(updated_at) > ttl_seconds:
+                return None
+        value = _decode(v, schema_version)
+        if value is None:
+            return None
+        return value, int(updated_at)
+
+
+class FileKVCache:
+    """
+    One file per key for large, read-mostly values. Each file holds a one-byte
+    schema version followed by the encoded payload; the file mtime is the
+    updated_at timestamp used for TTL checks.
+
+    Each write is atomic on its own, but there are no multi-key transactions:
+    set_json_many writes one file per key, and a failure part-way through
+    leaves the earlier keys updated.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        ensure_dir(root)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key.replace(os.sep, "_").replace(":", "_") + ".bin")
+
+    def set_json(self, key: str, value: Any) -> None:
+        payload, schema_version = _encode(value)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(bytes((schema_version,)))
+            f.write(payload)
+        # Atomic swap so concurrent readers never see a partial file
+        os.replace(tmp, path)
+
+    def set_json_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        # Same interface as SqliteKVCache.set_json_many, but one write per key
+        for key, value in items:
+            self.set_json(key, value)
 
     def get_json(self, key: str, ttl_seconds: Optional[int] = None) -> Optional[Any]:
-        conn = sqlite3.connect(self.db_path)
+        entry = self.get_entry(key, ttl_seconds=ttl_seconds)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str, ttl_seconds: Optional[int] = None) -> Optional[Tuple[Any, int]]:
         try:
-            cur = conn.execute(
-                "SELECT v, updated_at FROM kv_store WHERE k = ? LIMIT 1", (key,)
-            )
-            row = cur.fetchone()
-            if row is None:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            return None
+        with f:
+            st = os.fstat(f.fileno())
+            updated_at = int(st.st_mtime)
+            if ttl_seconds is not None and int(time.time()) - updated_at > ttl_seconds:
                 return None
-            v, updated_at = row
-            if ttl_seconds is not None:
-                if int(time.time()) - int(updated_at) > ttl_seconds:
-                    return None
-            return json.loads(v)
-        finally:
-            conn.close()
+            if st.st_size < 2:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                payload = view[1:]
+                try:
+                    value = _decode(payload, view[0])
+                finally:
+                    payload.release()
+                    view.release()
+        if value is None:
+            return None
+        return value, updated_at
+
+    def close(self) -> None:
+        pass
 
 
 class MarketCache:
     def __init__(self, db_path: str) -> None:
         self.kv = SqliteKVCache(db_path)
+        # Market lists are few, large and read on every start: keep them as
+        # plain files next to the database so reads are served by the page cache.
+        # The tradeoff is that saving several exchanges is no longer a single
+        # transaction, and market writes never touch the sqlite WAL.
+        self.files = FileKVCache(os.path.join(os.path.dirname(db_path) or ".", "markets"))
+        # key -> (updated_at, value); saves repeated store reads + decodes
+        self._mem: Dict[str, Tuple[int, Any]] = {}
+
+    def _load(
+        self,
+        store,
+        key: str,
+        ttl_seconds: int,
+        convert: Optional[Callable[[Any], Any]] = None,
+    ) -> Optional[Any]:
+        hit = self._mem.get(key)
+        if hit is not None:
+            updated_at, value = hit
+            if int(time.time()) - updated_at <= ttl_seconds:
+                return value
+        entry = store.get_entry(key, ttl_seconds=ttl_seconds)
+        if entry is None:
+            return None
+        value, updated_at = entry
+        if convert is not None:
+            value = convert(value)
+        self._mem[key] = (updated_at, value)
+        return value
+
+    def load_cached_markets(self, exchange_id: str, ttl_seconds: int) -> Optional[Markets]:
+        return self._load(self.files, f"markets:{exchange_id}", ttl_seconds, Markets.from_cache)
+
+    def save_markets(self, exchange_id: str, markets: Markets) -> None:
+        key = f"markets:{exchange_id}"
+        self._mem.pop(key, None)
+        self.files.set_json(key, markets.to_cache())
+
+    def save_markets_many(self, items: Iterable[Tuple[str, Markets]]) -> None:
+        # One atomic file replace per exchange; see FileKVCache
+        rows = [(f"markets:{exchange_id}", markets.to_cache()) for exchange_id, markets in items]
+        for key, _ in rows:
+            self._mem.pop(key, None)
+        self.files.set_json_many(rows)
+
+    def load_cached_currency_fees(self, exchange_id: str, ttl_seconds: int) -> Optional[Any]:
+        return self._load(self.kv, f"currencies:{exchange_id}", ttl_seconds)
+
+    def save_currency_fees(self, exchange_id: str, fees: Any) -> None:
+        key = f"currencies:{exchange_id}"
+        self._mem.pop(key, None)
+        self.kv.set_json(key, fees)
+
+    def load_cached_network_fee(
+        self, exchange_a: str, exchange_b: str, currency_code: str, ttl_seconds: int
+    ) -> Optional[Tuple[Optional[str], float]]:
+        # (network, withdraw_fee); (None, 0.0) records "no common network"
+        cached = self._load(self.kv, f"netfee:{exchange_a}:{exchange_b}:{currency_code}", ttl_seconds)
+        if cached is None:
+            return None
+        return cached[0], float(cached[1])
+
+    def save_network_fees(
+        self, exchange_a: str, exchange_b: str, fees: Dict[str, Tuple[Optional[str], float]]
+    ) -> None:
+        rows = [
+            (f"netfee:{exchange_a}:{exchange_b}:{code}", [network, fee])
+            for code, (network, fee) in fees.items()
+        ]
+        for key, _ in rows:
+            self._mem.pop(key, None)
+        self.kv.set_json_many(rows)
 
-    def load_cached_markets(self, exchange_id: str, ttl_seconds: int) -> Optional[Any]:
-        return self.kv.get_json(f"markets:{exchange_id}", ttl_seconds=ttl_seconds)
+    def checkpoint(self) -> None:
+        self.kv.checkpoint()
 
-    def save_markets(self, exchange_id: str, markets: Any) -> None:
-        self.kv.set_json(f"markets:{exchange_id}", markets)
\ No newline at end of file
+    def close(self) -> None:
+        self.kv.close()
@@ -4,118 +4,174 @@ import argparse
 import asyncio
 import json
 import sys
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-from .config import settings, Settings
-from .scanner import ArbitrageScanner
-from .utils import get_logger, AsyncLimiter
+from .config import get_settings, Settings
+from .utils import get_logger, AsyncLimiter, closer
+
+# Heavy modules (scanner, exchanges: numpy, numba, ccxt) are imported inside
+# the commands, so --help and argument errors stay fast
+if TYPE_CHECKING:
+    from .markets import Markets
 
 logger = get_logger("cli")
 
 
-def use_uvloop_if_available() -> None:
+def run_with_fastest_loop(coro) -> None:
+    # uvloop's libuv-based loop when installed, else the default asyncio loop.
+    # uvloop.run sets up the loop for this run only instead of replacing the
+    # process-wide event loop policy.
     try:
         import uvloop  # type: ignore
+    except ImportError:
+        asyncio.run(coro)
+        return
+    uvloop.run(coro)
+
+
+async def _load_markets(ex: str, cfg: Settings, cache) -> Tuple[str, Markets, bool]:
+    """
+    Load spot markets for one exchange, preferring the cache.
+    Returns (exchange_id, markets, fresh); fresh lists still need to be saved.
+    """
+    from .exchanges import close_exchange, create_exchange, fetch_spot_markets
 
-        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
-    except Exception:  # noqa: BLE001
-        pass
+    async with closer(await create_exchange(ex, cfg), close_exchange) as e:
+        markets = cache.load_cached_markets(e.id, cfg.markets_ttl_seconds)
+        if markets is not None:
+            return e.id, markets, False
+        return e.id, await fetch_spot_markets(e), True
 
 
 async def cmd_update_markets(args, cfg: Settings):
+    from .scanner import ArbitrageScanner
+
     scanner = ArbitrageScanner(cfg)
-    # Update markets for all configured exchanges
-    for ex in cfg.exchanges:
-        from .exchanges import create_exchange, load_all_markets
+    cache = scanner.market_cache
+    limiter = AsyncLimiter(cfg.concurrency)
 
-        e = await create_exchange(ex, cfg)
-        try:
+    async def update_one(ex: str):
+        async with limiter:
             try:
-                markets = await load_all_markets(e, scanner.market_cache, cfg.markets_ttl_seconds)
-                logger.info("Loaded markets for %s: %d spot symbols", e.id, len(markets))
+                ex_id, markets, fresh = await _load_markets(ex, cfg, cache)
+                logger.info("Loaded markets for %s: %d spot symbols", ex_id, len(markets))
+                return ex_id, markets, fresh
             except Exception as exc:  # noqa: BLE001
                 logger.warning("Failed loading markets for %s: %s", ex, exc)
-        finally:
-            try:
-                await e.close()
-            except Exception:  # noqa: BLE001
-                pass
+                return None
+
+    # Update markets for all configured exchanges concurrently; fresh lists are saved together
+    loaded = await asyncio.gather(*[update_one(ex) for ex in cfg.exchanges])
+    cache.save_markets_many((ex_id, markets) for ex_id, markets, fresh in filter(None, loaded) if fresh)
     print("Markets update attempted for:", ", ".join(cfg.exchanges))
 
 
 async def cmd_scan_simple(args, cfg: Settings):
+    from .scanner import ArbitrageScanner
+
     scanner = ArbitrageScanner(cfg)
     a = args.a or cfg.exchanges[0]
     b = args.b or (cfg.exchanges[1] if len(cfg.exchanges) > 1 else None)
     if not b:
         print("Please specify two exchanges via --a and --b or set EXCHANGES env")
         sys.exit(1)
-    await scanner.scan_two_exchanges(a, b)
+    try:
+        await scanner.scan_two_exchanges(a, b)
+    finally:
+        await scanner.aclose()
 
 
 async def cmd_dump_markets(args, cfg: Settings):
-    from .exchanges import create_exchange, load_all_markets
     from .cache import MarketCache
 
     cache = MarketCache(cfg.cache_db_path)
     exchanges: List[str] = args.exchanges or list(cfg.exchanges)
+    limiter = AsyncLimiter(cfg.concurrency)
 
-    result = {}
-    for ex in exchanges:
-        e = await create_exchange(ex, cfg)
-        try:
-            markets = await load_all_markets(e, cache, cfg.markets_ttl_seconds)
-            result[e.id] = markets
-            logger.info("%s: %d spot markets", e.id, len(markets))
-        except Exception as exc:  # noqa: BLE001
-            logger.warning("%s: failed to load markets: %s", ex, exc)
-        finally:
+    async def dump_one(ex: str):
+        async with limiter:
             try:
-                await e.close()
-            except Exception:  # noqa: BLE001
-                pass
+                ex_id, markets, fresh = await _load_markets(ex, cfg, cache)
+                logger.info("%s: %d spot markets", ex_id, len(markets))
+                return ex_id, markets, fresh
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("%s: failed to load markets: %s", ex, exc)
+                return None
+
+    fresh: List[Tuple[str, Markets]] = []
+    counts: List[Tuple[str, int]] = []
+    # Load concurrently, but write in --exchanges order: each exchange is written
+    # once it and every exchange before it have loaded, rather than buffering
+    # every exchange's records into one document
+    tasks = [asyncio.ensure_future(dump_one(ex)) for ex in exchanges]
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        if out is not None:
+            out.write("{")
+        for task in tasks:
+            loaded = await task
+            if loaded is None:
+                continue
+            ex_id, markets, is_fresh = loaded
+            if is_fresh:
+                fresh.append((ex_id, markets))
+            counts.append((ex_id, len(markets)))
+            if out is not None:
+                out.write("\n" if len(counts) == 1 else ",\n")
+                out.write(json.dumps(ex_id) + ": ")
+                json.dump(markets.to_records(), out, ensure_ascii=False, indent=2)
+        if out is not None:
+            out.write("\n}\n")
+    finally:
+        for task in tasks:
+            task.cancel()
+        if out is not None:
+            out.close()
+    cache.save_markets_many(fresh)
 
     if args.out:
-        with open(args.out, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
         print(f"Saved markets to {args.out}")
     else:
         # Print a short summary
-        for ex, mkts in result.items():
-            print(f"{ex}: {len(mkts)} spot markets cached")
+        for ex, count in counts:
+            print(f"{ex}: {count} spot markets cached")
 
 
 async def cmd_fetch_orderbooks(args, cfg: Settings):
-    from .exchanges import create_exchange, load_all_markets, fetch_order_book_safe
-    from .utils import AsyncLimiter
+    from .exchanges import close_exchange, create_exchange, load_all_markets, fetch_order_book_safe
+    from .scanner import ArbitrageScanner
 
     ex_id: str = args.exchange
-    e = await create_exchange(ex_id, cfg)
-    try:
+    async with closer(await create_exchange(ex_id, cfg), close_exchange) as e:
         markets = await load_all_markets(e, ArbitrageScanner(cfg).market_cache, cfg.markets_ttl_seconds)
-        symbols = [m["symbol"] for m in markets]
+        symbols = list(markets.symbols)
         if args.sample and args.sample > 0:
             symbols = symbols[: args.sample]
-        limiter = AsyncLimiter(cfg.concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        for sym in symbols:
+            queue.put_nowait(sym)
         count = 0
 
-        async def worker(sym: str):
+        # A fixed pool of CONCURRENCY workers drains the queue, so only that
+        # many tasks (and order books) are alive at any time
+        async def worker():
             nonlocal count
-            async with limiter:
+            while True:
+                try:
+                    sym = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
                 ob = await fetch_order_book_safe(e, sym, limit=cfg.orderbook_limit)
                 if ob and ob.get("bids") and ob.get("asks"):
                     count += 1
 
-        await asyncio.gather(*[worker(s) for s in symbols])
+        await asyncio.gather(*[worker() for _ in range(max(1, min(cfg.concurrency, len(symbols))))])
         print(f"Fetched {count}/{len(symbols)} orderbooks for {e.id}")
-    finally:
-        try:
-            await e.close()
-        except Exception:  # noqa: BLE001
-            pass
 
 
 async def cmd_scan_all(args, cfg: Settings):
+    from .scanner import ArbitrageScanner
+
     scanner = ArbitrageScanner(cfg)
     exchanges = list(cfg.exchanges)
 
@@ -136,12 +192,13 @@ async def cmd_scan_all(args, cfg: Settings):
             except Exception as exc:  # noqa: BLE001
                 logger.warning("%s-%s scan failed: %s", a, b, exc)
 
-    await asyncio.gather(*[scan_pair(a, b) for a, b in pairs])
+    try:
+        await asyncio.gather(*[scan_pair(a, b) for a, b in pairs])
+    finally:
+        await scanner.aclose()
 
 
 def main(argv: list[str] | None = None) -> int:
-    use_uvloop_if_available()
-
     parser = argparse.ArgumentParser(description="CEX<->CEX Arbitrage Scanner")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
@@ -169,9 +226,9 @@ def main(argv: list[str] | None = None) -> int:
     args = parser.parse_args(argv)
 
     async def runner():
-        await args.func(args, settings)
+        await args.func(args, get_settings())
 
-    asyncio.run(runner())
+    run_with_fastest_loop(runner())
     return 0
 
 
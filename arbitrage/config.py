@@ -1,49 +1,70 @@
 import os
-from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, List, Tuple, Optional
 
-from dotenv import load_dotenv
 
-load_dotenv()
+def _env_str(name: str, default: str) -> Callable[[], str]:
+    return lambda: os.getenv(name, default)
 
 
+def _env_opt(name: str) -> Callable[[], Optional[str]]:
+    return lambda: os.getenv(name)
+
+
+def _env_int(name: str, default: str) -> Callable[[], int]:
+    return lambda: int(os.getenv(name, default))
+
+
+def _env_float(name: str, default: str) -> Callable[[], float]:
+    return lambda: float(os.getenv(name, default))
+
+
+def _env_list(name: str, default: str) -> Callable[[], Tuple[str, ...]]:
+    return lambda: tuple(os.getenv(name, default).replace(" ", "").split(","))
+
+
+# Defaults are read from the environment when Settings() is constructed, not at
+# import time; .env is loaded when the arbitrage package is imported.
 @dataclass(frozen=True)
 class Settings:
-    exchanges: Tuple[str, ...] = tuple(
-        os.getenv(
-            "EXCHANGES",
-            "binance,kucoin,kraken,bybit,okx,gate,bitfinex,htx,mexc,coinbase",
-        ).replace(" ", "").split(",")
+    exchanges: Tuple[str, ...] = field(
+        default_factory=_env_list("EXCHANGES", "binance,kucoin,kraken,bybit,okx,gate,bitfinex,htx,mexc,coinbase")
     )
 
     # Arbitrage scanning defaults
-    min_profit_pct: float = float(os.getenv("MIN_PROFIT_PCT", "0.5"))  # percent
-    min_notional_usd: float = float(os.getenv("MIN_NOTIONAL_USD", "100"))
-    orderbook_limit: int = int(os.getenv("ORDERBOOK_LIMIT", "50"))
-    orderbook_ttl_seconds: int = int(os.getenv("ORDERBOOK_TTL", "5"))
-    markets_ttl_seconds: int = int(os.getenv("MARKETS_TTL", "86400"))  # 1 day
-    concurrency: int = int(os.getenv("CONCURRENCY", "16"))
-    pair_concurrency: int = int(os.getenv("PAIR_CONCURRENCY", "4"))
+    min_profit_pct: float = field(default_factory=_env_float("MIN_PROFIT_PCT", "0.5"))  # percent
+    min_notional_usd: float = field(default_factory=_env_float("MIN_NOTIONAL_USD", "100"))
+    orderbook_limit: int = field(default_factory=_env_int("ORDERBOOK_LIMIT", "50"))
+    orderbook_ttl_seconds: int = field(default_factory=_env_int("ORDERBOOK_TTL", "5"))
+    markets_ttl_seconds: int = field(default_factory=_env_int("MARKETS_TTL", "86400"))  # 1 day
+    concurrency: int = field(default_factory=_env_int("CONCURRENCY", "16"))
+    pair_concurrency: int = field(default_factory=_env_int("PAIR_CONCURRENCY", "4"))
+    table_limit: int = field(default_factory=_env_int("TABLE_LIMIT", "0"))  # rows printed per exchange pair, 0 = all
 
     # Cache
-    cache_db_path: str = os.getenv("CACHE_DB_PATH", "/workspace/.cache/arbitrage_cache.sqlite3")
+    cache_db_path: str = field(default_factory=_env_str("CACHE_DB_PATH", "/workspace/.cache/arbitrage_cache.sqlite3"))
 
     # Preferred quote assets for simple two-exchange scanning (treat ~USD)
-    preferred_quotes: Tuple[str, ...] = tuple(
-        os.getenv("PREFERRED_QUOTES", "USDT,USDC").replace(" ", "").split(",")
-    )
+    preferred_quotes: Tuple[str, ...] = field(default_factory=_env_list("PREFERRED_QUOTES", "USDT,USDC"))
 
     # Network preferences for transfers, comma-separated, most preferred first
-    network_priority: Tuple[str, ...] = tuple(
-        os.getenv("NETWORK_PRIORITY", "TRC20,ERC20,BEP20,Arbitrum,BSC").replace(" ", "").split(",")
+    network_priority: Tuple[str, ...] = field(
+        default_factory=_env_list("NETWORK_PRIORITY", "TRC20,ERC20,BEP20,Arbitrum,BSC")
     )
 
     # Optional API keys for future private endpoints (not required for public data)
-    binance_key: Optional[str] = os.getenv("BINANCE_API_KEY")
-    binance_secret: Optional[str] = os.getenv("BINANCE_API_SECRET")
-    kucoin_key: Optional[str] = os.getenv("KUCOIN_API_KEY")
-    kucoin_secret: Optional[str] = os.getenv("KUCOIN_API_SECRET")
-    kucoin_password: Optional[str] = os.getenv("KUCOIN_API_PASSPHRASE")
+    binance_key: Optional[str] = field(default_factory=_env_opt("BINANCE_API_KEY"))
+    binance_secret: Optional[str] = field(default_factory=_env_opt("BINANCE_API_SECRET"))
+    kucoin_key: Optional[str] = field(default_factory=_env_opt("KUCOIN_API_KEY"))
+    kucoin_secret: Optional[str] = field(default_factory=_env_opt("KUCOIN_API_SECRET"))
+    kucoin_password: Optional[str] = field(default_factory=_env_opt("KUCOIN_API_PASSPHRASE"))
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Settings built from the environment on first use and shared afterwards.
+    Call get_settings.cache_clear() to re-read after changing the environment.
+    """
+    return Settings()
@@ -1,17 +1,25 @@
 from .ccxt_client import (
     create_exchange,
+    close_exchange,
     load_all_markets,
+    fetch_spot_markets,
     fetch_order_book_safe,
     get_taker_fee_for_market,
     find_common_symbols,
     find_cheapest_common_network_fee,
+    fetch_currency_network_fees,
+    cheapest_common_network,
 )
 
 __all__ = [
     "create_exchange",
+    "close_exchange",
     "load_all_markets",
+    "fetch_spot_markets",
     "fetch_order_book_safe",
     "get_taker_fee_for_market",
     "find_common_symbols",
     "find_cheapest_common_network_fee",
+    "fetch_currency_network_fees",
+    "cheapest_common_network",
 ]
\ No newline at end of file
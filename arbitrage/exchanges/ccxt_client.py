@@ -1,11 +1,19 @@
 from __future__ import annotations
 
 import asyncio
+import socket
+import ssl
+import sys
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
+import aiohttp
 import ccxt.async_support as ccxt  # type: ignore
+import certifi
+import numpy as np
 
 from ..config import Settings
+from ..markets import TAKER_MAX_E5, Markets, quantize_taker, taker_rate
 from ..utils import get_logger
 
 logger = get_logger("exchanges")
@@ -42,39 +50,100 @@ async def create_exchange(exchange_id: str, settings: Settings) -> ccxt.Exchange
                 }
             )
 
-    exchange: ccxt.Exchange = exchange_class(kwargs)
-    return exchange
+    # Our own session, passed through ccxt's documented `session` option: a
+    # bounded keep-alive pool with DNS caching. The connector otherwise matches
+    # the one ccxt builds itself (certifi CA bundle, dual-stack Happy Eyeballs).
+    # ccxt does not close a session it was given; use close_exchange().
+    connector = aiohttp.TCPConnector(
+        limit_per_host=settings.concurrency,
+        ttl_dns_cache=300,
+        keepalive_timeout=60,
+        ssl=ssl.create_default_context(cafile=certifi.where()),
+        enable_cleanup_closed=True,
+        family=socket.AF_UNSPEC,
+        happy_eyeballs_delay=0,
+    )
+    session = aiohttp.ClientSession(connector=connector)
+    kwargs["session"] = session
+    try:
+        return exchange_class(kwargs)
+    except BaseException:
+        await session.close()
+        raise
+
+
+async def close_exchange(exchange: ccxt.Exchange) -> None:
+    # exchange.close() leaves a caller-provided session open, so close it too
+    session = exchange.session
+    try:
+        await exchange.close()
+    finally:
+        if session is not None:
+            await session.close()
 
 
 async def load_all_markets(
     exchange: ccxt.Exchange,
     markets_cache,
     ttl_seconds: int,
-) -> List[Dict[str, Any]]:
+) -> Markets:
     cached = markets_cache.load_cached_markets(exchange.id, ttl_seconds)
     if cached is not None:
         return cached
 
+    markets = await fetch_spot_markets(exchange)
+    markets_cache.save_markets(exchange.id, markets)
+    return markets
+
+
+async def fetch_spot_markets(exchange: ccxt.Exchange) -> Markets:
+    # Uncached load; callers batching several exchanges persist the result themselves
     await exchange.load_markets()  # populates exchange.markets
 
-    markets: List[Dict[str, Any]] = []
+    default_taker = exchange.fees.get("trading", {}).get("taker", 0.001)
+    symbols: List[str] = []
+    bases: List[str] = []
+    quotes: List[str] = []
+    takers: List[int] = []
+    actives: List[bool] = []
     for market in exchange.markets.values():
         if not market.get("spot", True):
             continue
         if market.get("active") is False:
             continue
-        markets.append(
-            {
-                "symbol": market["symbol"],
-                "base": market["base"],
-                "quote": market["quote"],
-                "taker": float(market.get("taker") or exchange.fees.get("trading", {}).get("taker", 0.001)),
-                "active": bool(market.get("active", True)),
-            }
-        )
+        symbols.append(sys.intern(market["symbol"]))
+        bases.append(sys.intern(market["base"]))
+        quotes.append(sys.intern(market["quote"]))
+        takers.append(quantize_taker(market.get("taker") or default_taker))
+        # ccxt reports active=None when unknown; stored as False, as before
+        actives.append(bool(market.get("active", True)))
+    return Markets(
+        symbols=symbols,
+        base=bases,
+        quote=quotes,
+        taker_e5=np.array(takers, dtype=np.int16),
+        active=np.array(actives, dtype=bool),
+    )
 
-    markets_cache.save_markets(exchange.id, markets)
-    return markets
+
+# Order book depths accepted by exchanges that reject other values. Exchanges
+# that take any depth up to a cap (kraken: 1..500) are left out, since rounding
+# up to a listed value would only fetch more levels than requested.
+_OB_LIMITS: Dict[str, Tuple[int, ...]] = {
+    "kucoin": (20, 100),
+    "kucoinfutures": (20, 100),
+    "binance": (5, 10, 20, 50, 100, 500, 1000, 5000),
+    "bitfinex": (1, 25, 100),
+}
+
+
+@lru_cache(maxsize=None)
+def _order_book_limit(exchange_id: str, limit: int) -> int:
+    # Smallest allowed depth covering the requested limit (or the deepest one)
+    allowed = _OB_LIMITS.get(exchange_id)
+    if not allowed:
+        return limit
+    return next((cand for cand in allowed if cand >= limit), allowed[-1])
 
 
 async def fetch_order_book_safe(
@@ -82,63 +151,67 @@ async def fetch_order_book_safe(
     symbol: str,
     limit: int = 50,
 ) -> Optional[Dict[str, Any]]:
-    # Try with requested limit
     try:
-        return await exchange.fetch_order_book(symbol, limit=limit)
+        return await exchange.fetch_order_book(symbol, limit=_order_book_limit(exchange.id, limit))
     except Exception as exc1:  # noqa: BLE001
-        msg = str(exc1)
-        # Some exchanges (e.g., Kucoin) only allow specific limits (20 or 100)
-        candidates: List[Optional[int]] = []
-        if exchange.id in ("kucoin", "kucoinfutures"):
-            candidates = [20, 100]
-        elif "limit" in msg and any(x in msg for x in ["20", "50", "100", "500", "1000"]):
-            candidates = [20, 50, 100]
-        else:
-            candidates = [None]
-        for cand in candidates:
-            try:
-                if cand is None:
-                    return await exchange.fetch_order_book(symbol)
-                return await exchange.fetch_order_book(symbol, limit=cand)
-            except Exception:  # noqa: BLE001
-                continue
+        # Retry once with the exchange's default depth. Replaces guessing
+        # [20, 50, 100] from the error text: known depths are in _OB_LIMITS.
+        try:
+            return await exchange.fetch_order_book(symbol)
+        except Exception:  # noqa: BLE001
+            pass
         logger.warning("%s fetch_order_book(%s) failed: %s", exchange.id, symbol, exc1)
         return None
 
 
-def get_taker_fee_for_market(exchange_id: str, market: Dict[str, Any]) -> float:
-    rate = float(market.get("taker", 0.001))
-    # Safety clamp
-    if rate < 0:
-        rate = 0.0
-    if rate > 0.02:  # unlikely higher than 2%
-        rate = 0.02
-    return rate
+def get_taker_fee_for_market(exchange_id: str, markets: Markets, symbol: str) -> float:
+    q = int(markets.taker_e5[markets.index_of(symbol)])
+    # Safety clamp (already applied when quantizing; 2% is an unlikely high)
+    if q < 0:
+        q = 0
+    if q > TAKER_MAX_E5:
+        q = TAKER_MAX_E5
+    return taker_rate(q)
 
 
 def find_common_symbols(
-    markets_a: List[Dict[str, Any]],
-    markets_b: List[Dict[str, Any]],
+    markets_a: Markets,
+    markets_b: Markets,
     preferred_quotes: Optional[Tuple[str, ...]] = None,
 ) -> List[str]:
-    set_a = {(m["base"], m["quote"]) for m in markets_a if m.get("active", True)}
-    set_b = {(m["base"], m["quote"]) for m in markets_b if m.get("active", True)}
+    # Filter by quote before intersecting and only format symbols at the end
+    quotes = {q.upper() for q in preferred_quotes or ()}
+    set_a = {
+        (base, quote)
+        for base, quote, active in zip(markets_a.base, markets_a.quote, markets_a.active.tolist())
+        if active and (not quotes or quote.upper() in quotes)
+    }
+    set_b = {
+        (base, quote)
+        for base, quote, active in zip(markets_b.base, markets_b.quote, markets_b.active.tolist())
+        if active and (not quotes or quote.upper() in quotes)
+    }
     common = set_a & set_b
-    symbols = [f"{base}/{quote}" for base, quote in common]
-    if preferred_quotes:
-        quotes = set(q.upper() for q in preferred_quotes)
-        symbols = [s for s in symbols if s.split("/")[1].upper() in quotes]
-    symbols.sort()
-    return symbols
+    return sorted(f"{base}/{quote}" for base, quote in common)
+
 
+async def fetch_currency_network_fees(
+    exchange: ccxt.Exchange,
+    markets_cache=None,
+    ttl_seconds: Optional[int] = None,
+) -> Optional[Dict[str, Dict[str, float]]]:
+    # Returns mapping: currency_code -> { network_name -> withdraw_fee_in_currency },
+    # or None when the currency table could not be fetched
+    if markets_cache is not None and ttl_seconds is not None:
+        cached = markets_cache.load_cached_currency_fees(exchange.id, ttl_seconds)
+        if cached is not None:
+            return cached
 
-async def _extract_currency_network_fees(exchange: ccxt.Exchange) -> Dict[str, Dict[str, float]]:
-    # Returns mapping: currency_code -> { network_name -> withdraw_fee_in_currency }
     try:
         currencies = await exchange.fetch_currencies()
     except Exception as exc:  # noqa: BLE001
         logger.warning("%s fetch_currencies failed: %s", exchange.id, exc)
-        return {}
+        return None
 
     result: Dict[str, Dict[str, float]] = {}
     for code, data in (currencies or {}).items():
@@ -159,25 +232,53 @@ async def _extract_currency_network_fees(exchange: ccxt.Exchange) -> Dict[str, D
             network_fees[net_name] = fee
         if network_fees:
             result[code] = network_fees
+
+    if markets_cache is not None and result:
+        markets_cache.save_currency_fees(exchange.id, result)
     return result
 
 
+def cheapest_common_network(
+    fees_a: Dict[str, Dict[str, float]],
+    fees_b: Dict[str, Dict[str, float]],
+    currency_code: str,
+) -> Optional[Tuple[str, float]]:
+    # Network with the lowest combined withdraw fee on both sides, returned
+    # with exchange A's withdraw fee. Pure: works on already-fetched tables.
+    a = fees_a.get(currency_code) or {}
+    b = fees_b.get(currency_code) or {}
+    if not a or not b:
+        return None
+    # Single pass over the smaller mapping, tracking the lowest combined fee
+    small, large = (a, b) if len(a) <= len(b) else (b, a)
+    best_network: Optional[str] = None
+    best_sum = float("inf")
+    for network, fee_small in small.items():
+        fee_large = large.get(network)
+        if fee_large is None:
+            continue
+        total = fee_small + fee_large
+        if total < best_sum:
+            best_sum = total
+            best_network = network
+    if best_network is None:
+        return None
+    return best_network, float(a[best_network])
+
+
 async def find_cheapest_common_network_fee(
     exchange_a: ccxt.Exchange,
     exchange_b: ccxt.Exchange,
     currency_code: str,
+    markets_cache=None,
+    ttl_seconds: Optional[int] = None,
 ) -> Optional[Tuple[str, float]]:
+    # Public single-currency lookup, kept for external callers. The scanner
+    # fetches both tables once and calls cheapest_common_network per base.
     fees_a, fees_b = await asyncio.gather(
-        _extract_currency_network_fees(exchange_a),
-        _extract_currency_network_fees(exchange_b),
+        fetch_currency_network_fees(exchange_a, markets_cache, ttl_seconds),
+        fetch_currency_network_fees(exchange_b, markets_cache, ttl_seconds),
     )
-    a = fees_a.get(currency_code) or {}
-    b = fees_b.get(currency_code) or {}
-    if not a or not b:
-        return None
-    common_networks = set(a.keys()) & set(b.keys())
-    if not common_networks:
+    if fees_a is None or fees_b is None:
         return None
-    # Pick the lowest fee network, tie-breaking by a simple alphabetical order
-    best_network = min(common_networks, key=lambda n: (a.get(n, float("inf")) + b.get(n, 0.0)))
-    return best_network, float(a[best_network])
\ No newline at end of file
+    return cheapest_common_network(fees_a, fees_b, currency_code)
@@ -2,43 +2,42 @@ from __future__ import annotations
 
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
+from ._kernels import eval_pair, vwap
+
+# (asks, bids) as (N, 2) float64 [price, amount] arrays
+Book = Tuple[np.ndarray, np.ndarray]
+
 
 def compute_vwap_for_amount(side: str, levels: List[List[float]], amount_base: float) -> Optional[Tuple[float, float]]:
     """
     Compute VWAP price and filled amount for the requested base amount.
 
     side: "buy" -> consumes asks; "sell" -> consumes bids
-    levels: order book side [[price, amount, ...], ...]
+    levels: order book side [[price, amount, ...], ...] or an (N, 2+) float array
     amount_base: amount of base asset to buy/sell
     Returns: (avg_price, filled_amount)
     """
     if amount_base <= 0:
         return None
-    remaining = float(amount_base)
-    total_quote = 0.0
-    filled = 0.0
-    for level in levels:
-        if not level or len(level) < 2:
-            continue
-        try:
-            price = float(level[0])
-            amount = float(level[1])
-        except Exception:  # noqa: BLE001
-            continue
-        if amount <= 0 or price <= 0:
-            continue
-        take = min(remaining, amount)
-        total_quote += take * price
-        remaining -= take
-        filled += take
-        if remaining <= 1e-12:
-            break
+    avg_price, filled = vwap(book_side_array(levels), amount_base)
     if filled <= 0:
         return None
-    avg_price = total_quote / filled
     return avg_price, filled
 
 
+def _levels_array(levels) -> Optional[np.ndarray]:
+    # None when the levels cannot be viewed as a rectangular numeric array
+    try:
+        arr = np.asarray(levels, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+    if arr.ndim != 2 or arr.shape[1] < 2:
+        return None
+    return arr
+
+
 def estimate_fee_aware_profit_pct(
     buy_price: float,
     sell_price: float,
@@ -65,4 +64,68 @@ def estimate_fee_aware_profit_pct(
     if cost_quote_with_fee <= 0:
         return -100.0
     profit_pct = (revenue_quote_after_fee - cost_quote_with_fee) / cost_quote_with_fee * 100.0
-    return profit_pct
\ No newline at end of file
+    return profit_pct
+
+
+def book_side_array(levels, limit: Optional[int] = None) -> np.ndarray:
+    """
+    Convert an order book side into a contiguous (N, 2) float64 [price, amount] array.
+    Only the best `limit` levels are kept when given; levels that are too short
+    or non-numeric are dropped.
+    """
+    if limit is not None and levels is not None:
+        levels = levels[:limit]
+    arr = _levels_array(levels)
+    if arr is None:
+        rows: List[Tuple[float, float]] = []
+        for level in levels or ():
+            if not level or len(level) < 2:
+                continue
+            try:
+                rows.append((float(level[0]), float(level[1])))
+            except Exception:  # noqa: BLE001
+                continue
+        arr = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    arr = arr[:, :2]
+    # np.asarray turns None entries into NaN; drop those levels like bad ones
+    finite = np.isfinite(arr).all(axis=1)
+    if not finite.all():
+        arr = arr[finite]
+    return np.ascontiguousarray(arr)
+
+
+def order_book_arrays(order_book: Optional[Dict], limit: Optional[int] = None) -> Optional[Book]:
+    """
+    Parse a ccxt order book dict into (asks, bids) book_side_array() arrays,
+    once per fetch; consumers read the arrays instead of the nested lists.
+    Returns None for a missing book.
+    """
+    if not order_book:
+        return None
+    return book_side_array(order_book.get("asks"), limit), book_side_array(order_book.get("bids"), limit)
+
+
+def estimate_pair_for_books(
+    book_a: Book,
+    book_b: Book,
+    target_quote: float,
+    min_base: float,
+    taker_fee_a: float,
+    taker_fee_b: float,
+    withdraw_fee_base: float,
+) -> Tuple[Optional[Tuple[float, float, float, float]], Optional[Tuple[float, float, float, float]]]:
+    """
+    Fused VWAP (both sides) + fee-aware profit over book_side_array() inputs,
+    for buy-on-A/sell-on-B and buy-on-B/sell-on-A in one compiled call, each
+    sized by target_quote at the buy side's top ask (at least min_base).
+
+    Returns: (a_to_b, b_to_a), each (profit_pct, base_amount, buy_avg, sell_avg) or None
+    """
+    asks_a, bids_a = book_a
+    asks_b, bids_b = book_b
+    p_ab, base_ab, buy_ab, sell_ab, p_ba, base_ba, buy_ba, sell_ba = eval_pair(
+        asks_a, bids_a, asks_b, bids_b, target_quote, min_base, taker_fee_a, taker_fee_b, withdraw_fee_base
+    )
+    a_to_b = (p_ab, base_ab, buy_ab, sell_ab) if base_ab > 0 else None
+    b_to_a = (p_ba, base_ba, buy_ba, sell_ba) if base_ba > 0 else None
+    return a_to_b, b_to_a
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Taker fees are stored as integer multiples of 1e-5 (a tenth of a basis point),
+# clamped to [0, 2%]
+TAKER_SCALE = 100_000
+TAKER_MAX_E5 = 2_000
+
+
+def quantize_taker(rate: float) -> int:
+    q = int(round(float(rate) * TAKER_SCALE))
+    if q < 0:
+        return 0
+    if q > TAKER_MAX_E5:
+        return TAKER_MAX_E5
+    return q
+
+
+def taker_rate(taker_e5: int) -> float:
+    return taker_e5 * 1e-5
+
+
+@dataclass
+class Markets:
+    """
+    Spot markets of one exchange in structure-of-arrays layout: row i of every
+    field describes the same market.
+    """
+
+    symbols: List[str]
+    base: List[str]
+    quote: List[str]
+    taker_e5: np.ndarray  # int16 taker fee, see quantize_taker
+    active: np.ndarray  # bool
+    _index: Optional[Dict[str, int]] = field(default=None, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def index_of(self, symbol: str) -> int:
+        if self._index is None:
+            self._index = {sym: i for i, sym in enumerate(self.symbols)}
+        return self._index[symbol]
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "Markets":
+        records = list(records)
+        return cls(
+            symbols=[sys.intern(m["symbol"]) for m in records],
+            base=[sys.intern(m["base"]) for m in records],
+            quote=[sys.intern(m["quote"]) for m in records],
+            taker_e5=np.array([quantize_taker(m.get("taker", 0.001)) for m in records], dtype=np.int16),
+            active=np.array([bool(m.get("active", True)) for m in records], dtype=bool),
+        )
+
+    @classmethod
+    def from_cache(cls, data: Any) -> "Markets":
+        # Older cache entries hold a list of per-market dicts
+        if isinstance(data, list):
+            return cls.from_records(data)
+        return cls(
+            symbols=[sys.intern(s) for s in data["symbols"]],
+            base=[sys.intern(s) for s in data["base"]],
+            quote=[sys.intern(s) for s in data["quote"]],
+            taker_e5=(
+                np.asarray(data["taker_e5"], dtype=np.int16)
+                if "taker_e5" in data
+                else np.array([quantize_taker(rate) for rate in data["taker"]], dtype=np.int16)
+            ),
+            active=np.asarray(data["active"], dtype=bool),
+        )
+
+    def to_cache(self) -> Dict[str, List[Any]]:
+        return {
+            "symbols": self.symbols,
+            "base": self.base,
+            "quote": self.quote,
+            "taker_e5": self.taker_e5.tolist(),
+            "active": self.active.tolist(),
+        }
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [
+            {"symbol": sym, "base": base, "quote": quote, "taker": taker_rate(q), "active": active}
+            for sym, base, quote, q, active in zip(
+                self.symbols, self.base, self.quote, self.taker_e5.tolist(), self.active.tolist()
+            )
+        ]
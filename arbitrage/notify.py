@@ -14,6 +14,20 @@ class Notifier:
     def __init__(self) -> None:
         self.telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.telegram_chat_id = os.getenv("TELEGRAM_CHAT_ID")
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def _session_get(self) -> aiohttp.ClientSession:
+        # One keep-alive session for all sends instead of a handshake per message
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=4, ttl_dns_cache=300)
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     async def send(self, message: str) -> None:
         logger.info("NOTIFY: %s", message)
@@ -28,9 +42,9 @@ class Notifier:
             "disable_web_page_preview": True,
         }
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as resp:
-                    if resp.status >= 300:
-                        logger.warning("Telegram send failed: %s", await resp.text())
+            session = await self._session_get()
+            async with session.post(url, json=payload) as resp:
+                if resp.status >= 300:
+                    logger.warning("Telegram send failed: %s", await resp.text())
         except Exception as exc:  # noqa: BLE001
             logger.warning("Telegram send exception: %s", exc)
\ No newline at end of file
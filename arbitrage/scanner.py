@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+from contextlib import AsyncExitStack
 from dataclasses import dataclass
+from operator import attrgetter
 from typing import Dict, List, Optional, Tuple
 
 from tabulate import tabulate
@@ -9,21 +11,30 @@ from tabulate import tabulate
 from .cache import MarketCache
 from .config import Settings
 from .exchanges import (
+    cheapest_common_network,
+    close_exchange,
     create_exchange,
+    fetch_currency_network_fees,
     fetch_order_book_safe,
-    find_cheapest_common_network_fee,
     find_common_symbols,
     get_taker_fee_for_market,
     load_all_markets,
 )
-from .fees import compute_vwap_for_amount, estimate_fee_aware_profit_pct
+from .markets import Markets
+from .fees import Book, estimate_pair_for_books, order_book_arrays
 from .notify import Notifier
-from .utils import AsyncLimiter, get_logger
+from .utils import AsyncLimiter, closer, get_logger
 
 logger = get_logger("scanner")
 
+# Floor for the notional-sized base amount, for quotes with extreme prices
+MIN_BASE_AMOUNT = 1e-6
 
-@dataclass
+# Network-fee entry for bases without a common withdrawal network
+NO_NETWORK: Tuple[Optional[str], float] = (None, 0.0)
+
+
+@dataclass(slots=True, frozen=True)
 class Opportunity:
     symbol: str
     buy_exchange: str
@@ -40,13 +51,60 @@ class ArbitrageScanner:
         self.settings = settings
         self.market_cache = MarketCache(settings.cache_db_path)
         self.notifier = Notifier()
+        # Read on every symbol; Settings is frozen, so convert once
+        self._target_quote = float(settings.min_notional_usd)
+        self._min_profit_pct = float(settings.min_profit_pct)
+        # Exchange clients (and their HTTP sessions) live for the scanner's
+        # lifetime; creation tasks are stored so concurrent scans share one
+        self._exchanges: Dict[str, asyncio.Task] = {}
+        self._limiters: Dict[str, AsyncLimiter] = {}
+
+    async def aclose(self) -> None:
+        tasks = list(self._exchanges.values())
+        self._exchanges.clear()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        # Unwinds in reverse: exchanges, then the notifier, then the checkpoint
+        async with AsyncExitStack() as stack:
+            # Fold fee lookups cached during the scan back into the database file
+            stack.push_async_callback(asyncio.to_thread, self.market_cache.checkpoint)
+            stack.push_async_callback(self.notifier.close)
+            for res in await asyncio.gather(*tasks, return_exceptions=True):
+                if not isinstance(res, BaseException):
+                    await stack.enter_async_context(closer(res, close_exchange))
+
+    async def _get_exchange(self, name: str):
+        task = self._exchanges.get(name)
+        if task is None:
+            task = asyncio.ensure_future(create_exchange(name, self.settings))
+            self._exchanges[name] = task
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # Let a later scan retry instead of caching the failure
+            if self._exchanges.get(name) is task:
+                del self._exchanges[name]
+            raise
+
+    def _get_limiter(self, ex) -> AsyncLimiter:
+        # One limiter per exchange, shared by every pair scanned against it
+        limiter = self._limiters.get(ex.id)
+        if limiter is None:
+            # ccxt rateLimit is milliseconds between requests
+            rate_limit_ms = getattr(ex, "rateLimit", None)
+            limiter = AsyncLimiter(
+                self.settings.concurrency,
+                rate_per_sec=1000.0 / rate_limit_ms if rate_limit_ms else None,
+            )
+            self._limiters[ex.id] = limiter
+        return limiter
 
     async def _prepare_exchanges(self, a: str, b: str):
-        ex_a = await create_exchange(a, self.settings)
-        ex_b = await create_exchange(b, self.settings)
+        ex_a, ex_b = await asyncio.gather(self._get_exchange(a), self._get_exchange(b))
         return ex_a, ex_b
 
-    async def _load_common_symbols(self, ex_a, ex_b) -> Tuple[List[Dict], List[Dict], List[str]]:
+    async def _load_common_symbols(self, ex_a, ex_b) -> Tuple[Markets, Markets, List[str]]:
         markets_a, markets_b = await asyncio.gather(
             load_all_markets(ex_a, self.market_cache, self.settings.markets_ttl_seconds),
             load_all_markets(ex_b, self.market_cache, self.settings.markets_ttl_seconds),
@@ -54,195 +112,207 @@ class ArbitrageScanner:
         symbols = find_common_symbols(markets_a, markets_b, self.settings.preferred_quotes)
         return markets_a, markets_b, symbols
 
-    async def _fetch_orderbooks_for_symbols(self, ex, symbols: List[str]) -> Dict[str, Optional[Dict]]:
-        limiter = AsyncLimiter(self.settings.concurrency)
-        results: Dict[str, Optional[Dict]] = {}
+    async def _fetch_orderbooks_all(self, ex_a, ex_b, symbols: List[str]) -> Tuple[Dict[str, Optional[Book]], Dict[str, Optional[Book]]]:
+        """
+        Fetch books for every symbol on both exchanges in one gather. Each
+        exchange keeps its own limiter, so one side's slow tail does not hold
+        back the other's free slots.
+        """
+        limit = self.settings.orderbook_limit
+        books_a: Dict[str, Optional[Book]] = {}
+        books_b: Dict[str, Optional[Book]] = {}
 
-        async def worker(sym: str):
+        async def worker(ex, limiter: AsyncLimiter, results: Dict[str, Optional[Book]], sym: str):
             async with limiter:
-                ob = await fetch_order_book_safe(ex, sym, limit=self.settings.orderbook_limit)
-                results[sym] = ob
+                ob = await fetch_order_book_safe(ex, sym, limit=limit)
+                # Convert once here, trimmed to ORDERBOOK_LIMIT (exchanges with fixed
+                # depths may return more), so both scan directions share the arrays
+                results[sym] = order_book_arrays(ob, limit)
+
+        tasks = []
+        for ex, results in ((ex_a, books_a), (ex_b, books_b)):
+            limiter = self._get_limiter(ex)
+            tasks.extend(worker(ex, limiter, results, sym) for sym in symbols)
+        for res in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(res, Exception):
+                logger.warning("Order book fetch failed: %s", res)
+        return books_a, books_b
 
-        await asyncio.gather(*[worker(s) for s in symbols])
-        return results
+    async def _resolve_network_fees(self, ex_a, ex_b, bases: List[str]) -> Dict[str, Tuple[Optional[str], float]]:
+        """
+        Cheapest common network and withdraw fee per base, from the persistent
+        cache where possible. Misses are resolved from both exchanges' currency
+        tables, fetched once and concurrently, and cached, including negative
+        results as (None, 0.0). If either table cannot be fetched the misses
+        are left out (callers fall back to NO_NETWORK) and nothing is cached,
+        so a transient API error is retried on the next scan.
+        """
+        ttl = self.settings.markets_ttl_seconds
+        resolved: Dict[str, Tuple[Optional[str], float]] = {}
+        missing: List[str] = []
+        for base in bases:
+            cached = self.market_cache.load_cached_network_fee(ex_a.id, ex_b.id, base, ttl)
+            if cached is None:
+                missing.append(base)
+            else:
+                resolved[base] = cached
+        if not missing:
+            return resolved
+
+        fees_a, fees_b = await asyncio.gather(
+            fetch_currency_network_fees(ex_a, self.market_cache, ttl),
+            fetch_currency_network_fees(ex_b, self.market_cache, ttl),
+        )
+        if fees_a is None or fees_b is None:
+            logger.warning(
+                "Network fees for %s-%s unavailable; %d bases scanned without withdraw fees",
+                ex_a.id, ex_b.id, len(missing),
+            )
+            return resolved
+        fetched: Dict[str, Tuple[Optional[str], float]] = {}
+        for base in missing:
+            net = cheapest_common_network(fees_a, fees_b, base)
+            fetched[base] = net if net is not None else NO_NETWORK
+        self.market_cache.save_network_fees(ex_a.id, ex_b.id, fetched)
+        resolved.update(fetched)
+        return resolved
+
+    def _evaluate_pair(
+        self,
+        sym: str,
+        id_a: str,
+        id_b: str,
+        book_a: Book,
+        book_b: Book,
+        taker_a: float,
+        taker_b: float,
+        network: Tuple[Optional[str], float],
+    ) -> List[Opportunity]:
+        """
+        Evaluate buy-on-A/sell-on-B and buy-on-B/sell-on-A for one symbol.
+        Base amounts are sized by the target notional at each buy side's top ask.
+        Both directions run in one compiled kernel; Python objects are only
+        built for results that clear the profit threshold.
+        """
+        network_name, withdraw_fee_base = network
+        min_profit_pct = self._min_profit_pct
+        a_to_b, b_to_a = estimate_pair_for_books(
+            book_a, book_b, self._target_quote, MIN_BASE_AMOUNT, taker_a, taker_b, withdraw_fee_base
+        )
+        found: List[Opportunity] = []
+        for buy_id, sell_id, res in ((id_a, id_b, a_to_b), (id_b, id_a, b_to_a)):
+            if res is None:
+                continue
+            profit_pct, base_amount, buy_avg, sell_avg = res
+            if profit_pct >= min_profit_pct:
+                found.append(
+                    Opportunity(
+                        symbol=sym,
+                        buy_exchange=buy_id,
+                        sell_exchange=sell_id,
+                        profit_pct=profit_pct,
+                        base_amount=base_amount,
+                        buy_price=buy_avg,
+                        sell_price=sell_avg,
+                        network=network_name,
+                    )
+                )
+        return found
 
     async def scan_two_exchanges(self, a: str, b: str) -> List[Opportunity]:
         ex_a, ex_b = await self._prepare_exchanges(a, b)
-        try:
-            markets_a, markets_b, symbols = await self._load_common_symbols(ex_a, ex_b)
-            if not symbols:
-                logger.warning("No common symbols between %s and %s", ex_a.id, ex_b.id)
-                return []
-
-            logger.info("Common symbols for %s-%s (quotes=%s): %d", ex_a.id, ex_b.id, ",".join(self.settings.preferred_quotes), len(symbols))
-
-            # Index markets by symbol for fee access
-            idx_a = {m["symbol"]: m for m in markets_a}
-            idx_b = {m["symbol"]: m for m in markets_b}
-
-            # Fetch order books concurrently on both exchanges
-            books_a_task = asyncio.create_task(self._fetch_orderbooks_for_symbols(ex_a, symbols))
-            books_b_task = asyncio.create_task(self._fetch_orderbooks_for_symbols(ex_b, symbols))
-            books_a, books_b = await asyncio.gather(books_a_task, books_b_task)
-
-            # Find network fee per base asset if possible (best common network)
-            # We'll lazily compute per base when needed
-            network_fee_cache: Dict[str, Tuple[Optional[str], float]] = {}
-
-            opportunities: List[Opportunity] = []
-
-            for sym in symbols:
-                ob_a = books_a.get(sym)
-                ob_b = books_b.get(sym)
-                if not ob_a or not ob_b:
-                    continue
-                base, quote = sym.split("/")
-                if quote.upper() not in set(q.upper() for q in self.settings.preferred_quotes):
-                    continue
-
-                taker_a = get_taker_fee_for_market(ex_a.id, idx_a[sym])
-                taker_b = get_taker_fee_for_market(ex_b.id, idx_b[sym])
-
-                # Base amount sized by target notional in quote on buy side
-                best_ask = ob_a.get("asks") or []
-                best_bid = ob_b.get("bids") or []
-                if not best_ask or not best_bid:
-                    continue
-
-                # Compute VWAP for buying on A and selling on B
-                # First estimate base amount via top-of-book ask on A
-                top_ask = best_ask[0][0]
-                target_quote = float(self.settings.min_notional_usd)
-                est_base_amount = max(1e-6, target_quote / float(top_ask))
-                buy_vwap = compute_vwap_for_amount("buy", best_ask, est_base_amount)
-                sell_vwap = compute_vwap_for_amount("sell", best_bid, est_base_amount)
-                if not buy_vwap or not sell_vwap:
-                    continue
-                buy_avg, buy_filled = buy_vwap
-                sell_avg, sell_filled = sell_vwap
-                base_amount = min(buy_filled, sell_filled)
-                if base_amount <= 0:
-                    continue
-
-                # Network fee for transferring base from A to B
-                if base not in network_fee_cache:
-                    net = await find_cheapest_common_network_fee(ex_a, ex_b, base)
-                    network_fee_cache[base] = (net[0], net[1]) if net else (None, 0.0)
-                network_name, withdraw_fee_base = network_fee_cache[base]
-
-                profit_ab = estimate_fee_aware_profit_pct(
-                    buy_price=buy_avg,
-                    sell_price=sell_avg,
-                    base_amount=base_amount,
-                    taker_fee_buy=taker_a,
-                    taker_fee_sell=taker_b,
-                    withdraw_fee_base=withdraw_fee_base,
-                )
-                if profit_ab >= self.settings.min_profit_pct:
-                    opportunities.append(
-                        Opportunity(
-                            symbol=sym,
-                            buy_exchange=ex_a.id,
-                            sell_exchange=ex_b.id,
-                            profit_pct=profit_ab,
-                            base_amount=base_amount,
-                            buy_price=buy_avg,
-                            sell_price=sell_avg,
-                            network=network_name,
-                        )
-                    )
+        markets_a, markets_b, symbols = await self._load_common_symbols(ex_a, ex_b)
+        if not symbols:
+            logger.warning("No common symbols between %s and %s", ex_a.id, ex_b.id)
+            return []
 
-                # Reverse direction B -> A
-                best_ask_b = ob_b.get("asks") or []
-                best_bid_a = ob_a.get("bids") or []
-                if best_ask_b and best_bid_a:
-                    top_ask_b = best_ask_b[0][0]
-                    est_base_amount_b = max(1e-6, target_quote / float(top_ask_b))
-                    buy_vwap_b = compute_vwap_for_amount("buy", best_ask_b, est_base_amount_b)
-                    sell_vwap_a = compute_vwap_for_amount("sell", best_bid_a, est_base_amount_b)
-                    if buy_vwap_b and sell_vwap_a:
-                        buy_avg_b, buy_filled_b = buy_vwap_b
-                        sell_avg_a, sell_filled_a = sell_vwap_a
-                        base_amount_b = min(buy_filled_b, sell_filled_a)
-                        if base not in network_fee_cache:
-                            net2 = await find_cheapest_common_network_fee(ex_b, ex_a, base)
-                            network_fee_cache[base] = (net2[0], net2[1]) if net2 else (None, 0.0)
-                        network_name2, withdraw_fee_base2 = network_fee_cache[base]
-                        taker_b_buy = taker_b
-                        taker_a_sell = taker_a
-                        profit_ba = estimate_fee_aware_profit_pct(
-                            buy_price=buy_avg_b,
-                            sell_price=sell_avg_a,
-                            base_amount=base_amount_b,
-                            taker_fee_buy=taker_b_buy,
-                            taker_fee_sell=taker_a_sell,
-                            withdraw_fee_base=withdraw_fee_base2,
-                        )
-                        if profit_ba >= self.settings.min_profit_pct:
-                            opportunities.append(
-                                Opportunity(
-                                    symbol=sym,
-                                    buy_exchange=ex_b.id,
-                                    sell_exchange=ex_a.id,
-                                    profit_pct=profit_ba,
-                                    base_amount=base_amount_b,
-                                    buy_price=buy_avg_b,
-                                    sell_price=sell_avg_a,
-                                    network=network_name2,
-                                )
-                            )
-
-            opportunities.sort(key=lambda o: o.profit_pct, reverse=True)
-
-            if opportunities:
-                headers = [
-                    "Symbol",
-                    "Buy@",
-                    "Sell@",
-                    "Profit %",
-                    "Base Amt",
-                    "Buy Px",
-                    "Sell Px",
-                    "Network",
-                ]
-                rows = [
-                    [
-                        o.symbol,
-                        o.buy_exchange,
-                        o.sell_exchange,
-                        f"{o.profit_pct:.3f}",
-                        f"{o.base_amount:.6f}",
-                        f"{o.buy_price:.6f}",
-                        f"{o.sell_price:.6f}",
-                        o.network or "?",
-                    ]
-                    for o in opportunities
+        logger.info("Common symbols for %s-%s (quotes=%s): %d", ex_a.id, ex_b.id, ",".join(self.settings.preferred_quotes), len(symbols))
+
+        # Fetch order books concurrently on both exchanges
+        books_a, books_b = await self._fetch_orderbooks_all(ex_a, ex_b, symbols)
+
+        # find_common_symbols already restricted symbols to the preferred
+        # quotes; split each symbol once for the fee lookup and the loop
+        sym_bases = [(sym, sym.split("/", 1)[0]) for sym in symbols]
+
+        # Best common network fee per base asset, resolved up front
+        network_fee_cache = await self._resolve_network_fees(
+            ex_a, ex_b, sorted({base for _, base in sym_bases})
+        )
+
+        id_a, id_b = ex_a.id, ex_b.id
+        # Top-of-book bid/ask ratio a direction needs before fees to reach min_profit_pct
+        min_ratio = 1.0 + self._min_profit_pct / 100.0
+        opportunities: List[Opportunity] = []
+
+        for sym, base in sym_bases:
+            ob_a = books_a.get(sym)
+            ob_b = books_b.get(sym)
+            if not ob_a or not ob_b:
+                continue
+
+            asks_a, bids_a = ob_a
+            asks_b, bids_b = ob_b
+            # Upper bound before any VWAP work: buys fill at or above the top ask,
+            # sells at or below the top bid, and fees only lower the result
+            if not (
+                (len(asks_a) and len(bids_b) and bids_b[0, 0] >= asks_a[0, 0] * min_ratio)
+                or (len(asks_b) and len(bids_a) and bids_a[0, 0] >= asks_b[0, 0] * min_ratio)
+            ):
+                continue
+
+            taker_a = get_taker_fee_for_market(id_a, markets_a, sym)
+            taker_b = get_taker_fee_for_market(id_b, markets_b, sym)
+
+            # Network fee for transferring base: one lookup, shared by both directions
+            network = network_fee_cache.get(base, NO_NETWORK)
+            opportunities.extend(
+                self._evaluate_pair(sym, id_a, id_b, ob_a, ob_b, taker_a, taker_b, network)
+            )
+
+        # Callers get the full list, best first; TABLE_LIMIT only caps the printed rows
+        opportunities.sort(key=attrgetter("profit_pct"), reverse=True)
+        table_limit = self.settings.table_limit
+        shown = opportunities[:table_limit] if table_limit > 0 else opportunities
+
+        if opportunities:
+            headers = [
+                "Symbol",
+                "Buy@",
+                "Sell@",
+                "Profit %",
+                "Base Amt",
+                "Buy Px",
+                "Sell Px",
+                "Network",
+            ]
+            rows = (
+                [
+                    o.symbol,
+                    o.buy_exchange,
+                    o.sell_exchange,
+                    f"{o.profit_pct:.3f}",
+                    f"{o.base_amount:.6f}",
+                    f"{o.buy_price:.6f}",
+                    f"{o.sell_price:.6f}",
+                    o.network or "?",
                 ]
-                print(tabulate(rows, headers=headers, tablefmt="github"))
-
-                # Optional notification of the best few opportunities
-                top = opportunities[:3]
-                for opp in top:
-                    msg = (
-                        f"Arb {opp.symbol}: buy {opp.buy_exchange} @ {opp.buy_price:.6f} -> "
-                        f"sell {opp.sell_exchange} @ {opp.sell_price:.6f} | "
-                        f"profit {opp.profit_pct:.3f}% | amt {opp.base_amount:.6f} | net {opp.network or '?'}"
-                    )
-                    try:
-                        await self.notifier.send(msg)
-                    except Exception:  # noqa: BLE001
-                        pass
-            else:
-                logger.info("No opportunities >= %.3f%% found for %s-%s", self.settings.min_profit_pct, ex_a.id, ex_b.id)
-
-            return opportunities
-        finally:
-            # Ensure HTTP sessions are closed
-            try:
-                await ex_a.close()
-            except Exception:  # noqa: BLE001
-                pass
-            try:
-                await ex_b.close()
-            except Exception:  # noqa: BLE001
-                pass
\ No newline at end of file
+                for o in shown
+            )
+            print(tabulate(rows, headers=headers, tablefmt="github"))
+
+            # Optional notification of the best few opportunities
+            msgs = [
+                f"Arb {opp.symbol}: buy {opp.buy_exchange} @ {opp.buy_price:.6f} -> "
+                f"sell {opp.sell_exchange} @ {opp.sell_price:.6f} | "
+                f"profit {opp.profit_pct:.3f}% | amt {opp.base_amount:.6f} | net {opp.network or '?'}"
+                for opp in opportunities[:3]
+            ]
+            # Sent concurrently; a failed send is logged and does not stop the others
+            for res in await asyncio.gather(*(self.notifier.send(m) for m in msgs), return_exceptions=True):
+                if isinstance(res, Exception):
+                    logger.warning("Notification failed: %s", res)
+        else:
+            logger.info("No opportunities >= %.3f%% found for %s-%s", self.settings.min_profit_pct, id_a, id_b)
+
+        return opportunities
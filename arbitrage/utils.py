@@ -1,8 +1,14 @@
 import asyncio
-import json
+import contextlib
+import itertools
 import logging
 import os
-from typing import Any, Iterable, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, List, Optional, Sequence, TypeVar, Union
+
+import aiolimiter
+import orjson
+
+T = TypeVar("T")
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -21,32 +27,86 @@ def get_logger(name: str) -> logging.Logger:
 
 
 class AsyncLimiter:
-    def __init__(self, max_concurrency: int):
+    """
+    Bounds in-flight operations to max_concurrency. With rate_per_sec set it
+    also paces entries through aiolimiter's leaky bucket, which refills at that
+    rate and holds up to `capacity` entries (default: max_concurrency) for bursts.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        rate_per_sec: Optional[float] = None,
+        capacity: Optional[float] = None,
+    ):
         self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._capacity = float(capacity if capacity is not None else max_concurrency)
+        self._bucket = (
+            aiolimiter.AsyncLimiter(self._capacity, self._capacity / rate_per_sec)
+            if rate_per_sec and rate_per_sec > 0
+            else None
+        )
 
-    async def __aenter__(self):
+    async def acquire(self, cost: float = 1.0) -> None:
         await self._semaphore.acquire()
+        if self._bucket is not None:
+            try:
+                await self._bucket.acquire(min(cost, self._capacity))
+            except BaseException:
+                self._semaphore.release()
+                raise
 
-    async def __aexit__(self, exc_type, exc, tb):
+    def release(self) -> None:
         self._semaphore.release()
 
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+
+@contextlib.asynccontextmanager
+async def closer(obj: T, close: Optional[Callable[[T], Awaitable[Any]]] = None) -> AsyncIterator[T]:
+    # `async with` for objects with an async close(), or closed by `close`
+    # (exchanges.close_exchange for ccxt clients); a failing close is
+    # suppressed so it cannot mask the body's result
+    try:
+        yield obj
+    finally:
+        try:
+            await (close(obj) if close is not None else obj.close())
+        except Exception:  # noqa: BLE001
+            pass
+
 
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
 
 def json_dumps(data: Any) -> str:
-    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
-
-
-def chunked(items: Iterable[Any], chunk_size: int) -> List[List[Any]]:
-    chunk: List[Any] = []
-    out: List[List[Any]] = []
-    for item in items:
-        chunk.append(item)
-        if len(chunk) >= chunk_size:
-            out.append(chunk)
-            chunk = []
-    if chunk:
-        out.append(chunk)
-    return out
\ No newline at end of file
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def json_dumps_bytes(data: Any) -> bytes:
+    # UTF-8 encoded json_dumps, without the str round-trip
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    return orjson.loads(data)
+
+
+def chunked(items: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    # Lazily yields lists of up to chunk_size items (at least one)
+    chunk_size = max(1, chunk_size)
+    it = iter(items)
+    while batch := list(itertools.islice(it, chunk_size)):
+        yield batch
+
+
+def chunked_view(items: Sequence[Any], chunk_size: int) -> Iterator[Sequence[Any]]:
+    # Slices of an indexable sequence; views (no copy) for arrays and memoryviews
+    chunk_size = max(1, chunk_size)
+    for start in range(0, len(items), chunk_size):
+        yield items[start : start + chunk_size]